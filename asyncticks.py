@@ -0,0 +1,116 @@
+"""
+Asyncio facade to get ticks without blocking the event loop
+"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import AsyncIterator
+import pandas as pd
+from accounts import LoginInfo
+from ticksgetter import TicksGetter, ensure_utc, split_range, copy_ticks_window
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_DURATION = timedelta(hours=1)
+
+
+class TicksFetchError(Exception):
+    """Raised when the terminal fails to return a chunk of ticks."""
+
+
+class AsyncTicksGetter:
+    """
+    Streams ticks from one terminal session to many concurrent asyncio consumers.
+
+    All MetaTrader5 calls run on a single dedicated thread, since the terminal connection is
+    process-wide. Requests are split into chunks, so calls of concurrent requests interleave
+    chunk by chunk instead of waiting for each other's whole range.
+    Nothing mutable is shared between requests, every fetch keeps its parameters to itself.
+    """
+
+    def __init__(self, max_concurrent: int = 8, prefetch: int = 2,
+                 chunk_duration: timedelta = DEFAULT_CHUNK_DURATION):
+        """
+        :param max_concurrent: maximum of chunk requests queued to the terminal at once.
+        :param prefetch: chunks fetched ahead of a consumer before fetching pauses.
+        :param chunk_duration: default duration of one chunk.
+        """
+        self.chunk_duration = chunk_duration
+        self.prefetch = prefetch
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='mt5')
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._connection = TicksGetter()
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: func(*args, **kwargs))
+
+    async def login(self, account_credentials: LoginInfo | str) -> bool:
+        """
+        Connects to the terminal on the MetaTrader5 thread.
+
+        :param account_credentials: LoginInfo or name of saved account.
+        :return: True if connected.
+        """
+        if isinstance(account_credentials, str):
+            return await self._run(self._connection.login, account_credentials)
+        return await self._run(self._connection.login, None, account_credentials=account_credentials)
+
+    async def close(self):
+        """Closes the connection and stops the MetaTrader5 thread."""
+        await self._run(self._connection.close_connection)
+        self._executor.shutdown(wait=True)
+
+    async def _get_chunk(self, symbol: str, window_from: datetime, window_to: datetime,
+                         is_last: bool) -> pd.DataFrame:
+        async with self._semaphore:
+            ticks = await self._run(copy_ticks_window, symbol, window_from, window_to, is_last)
+        if ticks is None:
+            raise TicksFetchError(f"Can't get ticks of {symbol} from {window_from} to {window_to}")
+        return pd.DataFrame(ticks)
+
+    async def fetch(self, symbol: str, start: datetime, end: datetime,
+                    chunk_duration: timedelta | None = None) -> AsyncIterator[pd.DataFrame]:
+        """
+        Streams ticks of a symbol chunk by chunk.
+        Fetching pauses while a consumer is more than `prefetch` chunks behind.
+
+        :param symbol: symbol to get ticks of.
+        :param start: starting date, naive dates are treated as UTC.
+        :param end: ending date, naive dates are treated as UTC.
+        :param chunk_duration: duration of one chunk, the facade default if None.
+        :return: async iterator of non-empty Dataframes of ticks.
+        """
+        if not self._connection.authorized:
+            raise TicksFetchError("Can't get ticks - not logged in")
+        start, end = ensure_utc(start), ensure_utc(end)
+        windows = split_range(start, end, chunk_duration or self.chunk_duration)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, self.prefetch))
+
+        async def produce():
+            try:
+                for window_from, window_to in windows:
+                    chunk = await self._get_chunk(symbol, window_from, window_to,
+                                                  is_last=window_to >= end)
+                    if len(chunk):
+                        await queue.put(chunk)
+            except Exception as excpt:
+                await queue.put(excpt)
+            await queue.put(None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while (chunk := await queue.get()) is not None:
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+        finally:
+            producer.cancel()
+            logger.info('Stream of %s from %s to %s finished', symbol, start, end)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
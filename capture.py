@@ -0,0 +1,450 @@
+"""
+Live ticks capture with ring-buffered batching to disk
+"""
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from string import Template
+from typing import NamedTuple, Protocol
+import numpy as np
+import pandas as pd
+import pytz
+from datatypes import Ticks, Formats
+from compression import Compression, open_compressed, write_ticks
+
+logger = logging.getLogger(__name__)
+
+# Layout of ticks returned by mt5.copy_ticks_* functions
+TICK_DTYPE = np.dtype([
+    ('time', '<i8'), ('bid', '<f8'), ('ask', '<f8'), ('last', '<f8'),
+    ('volume', '<u8'), ('time_msc', '<i8'), ('flags', '<u4'), ('volume_real', '<f8'),
+])
+TICK_FLAG_BID = 2
+TICK_FLAG_ASK = 4
+
+
+class TickSource(Protocol):
+    """Anything returning new ticks of a symbol, like the MetaTrader5 terminal."""
+
+    def copy_ticks_from(self, symbol: str, date_from: int, count: int) -> np.ndarray | None:
+        """
+        :param symbol: symbol to get ticks of.
+        :param date_from: seconds since epoch, ticks from this second on are returned.
+        :param count: maximum amount of ticks.
+        :return: array of TICK_DTYPE ordered by time_msc, None on failure.
+        """
+
+
+class MT5TickSource:
+    """Ticks source polling the MetaTrader5 terminal, login is expected to be done already."""
+
+    def __init__(self):
+        import MetaTrader5 as mt5
+        self.mt5 = mt5
+
+    def copy_ticks_from(self, symbol: str, date_from: int, count: int) -> np.ndarray | None:
+        return self.mt5.copy_ticks_from(symbol, date_from, count, self.mt5.COPY_TICKS_ALL)
+
+
+class FakeTickSource:
+    """
+    Ticks source emitting synthetic live ticks at a given rate, used to test capture without a terminal.
+    """
+
+    def __init__(self, rate: float = 10.0, digits: int = 5, history_ms: int = 60_000,
+                 clock=time.time, seed: int | None = None):
+        """
+        :param rate: average ticks per second of every symbol.
+        :param digits: digits of generated prices.
+        :param history_ms: how long generated ticks stay available.
+        :param clock: function returning current time in seconds.
+        :param seed: seed of the random generator.
+        """
+        self.rate = rate
+        self.digits = digits
+        self.history_ms = history_ms
+        self.clock = clock
+        self.random = np.random.default_rng(seed)
+        self._history: dict[str, np.ndarray] = {}
+        self._generated_to: dict[str, int] = {}
+        self._started_msc = int(clock() * 1000)
+
+    def _generate(self, symbol: str):
+        now_msc = int(self.clock() * 1000)
+        generated_to = self._generated_to.setdefault(symbol, self._started_msc)
+        history = self._history.get(symbol, np.empty(0, dtype=TICK_DTYPE))
+        count = self.random.poisson(self.rate * (now_msc - generated_to) / 1000)
+        new_ticks = np.zeros(count, dtype=TICK_DTYPE)
+        new_ticks['time_msc'] = np.sort(self.random.integers(generated_to, max(now_msc, generated_to + 1),
+                                                             count))
+        new_ticks['time'] = new_ticks['time_msc'] // 1000
+        point = 10.0 ** -self.digits
+        last_bid = history['bid'][-1] if len(history) else 1.0
+        steps = self.random.integers(-3, 4, count)
+        new_ticks['bid'] = np.round(last_bid + np.cumsum(steps) * point, self.digits)
+        new_ticks['ask'] = np.round(new_ticks['bid'] + self.random.integers(1, 20, count) * point,
+                                    self.digits)
+        new_ticks['flags'] = self.random.choice(
+            [TICK_FLAG_BID, TICK_FLAG_ASK, TICK_FLAG_BID | TICK_FLAG_ASK], count)
+        history = np.concatenate((history, new_ticks))
+        self._history[symbol] = history[np.searchsorted(history['time_msc'], now_msc - self.history_ms):]
+        self._generated_to[symbol] = now_msc
+
+    def copy_ticks_from(self, symbol: str, date_from: int, count: int) -> np.ndarray | None:
+        self._generate(symbol)
+        history = self._history[symbol]
+        start = np.searchsorted(history['time_msc'], date_from * 1000)
+        return history[start:start + count].copy()
+
+    def generated(self, symbol: str) -> np.ndarray:
+        """
+        :param symbol: symbol of the ticks.
+        :return: copy of the symbol's ticks generated so far and not yet dropped from history.
+        """
+        return self._history.get(symbol, np.empty(0, dtype=TICK_DTYPE)).copy()
+
+
+class TickRingBuffer:
+    """
+    Preallocated ring buffer of ticks.
+    When full, the oldest ticks are overwritten and counted as dropped.
+    """
+
+    def __init__(self, capacity: int, dtype: np.dtype = TICK_DTYPE):
+        self._data = np.empty(capacity, dtype=dtype)
+        self._start = 0
+        self.size = 0
+        self.dropped = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self._data)
+
+    def push(self, ticks: np.ndarray) -> int:
+        """
+        Appends ticks to the buffer.
+
+        :param ticks: array of ticks.
+        :return: amount of ticks dropped to fit the new ones.
+        """
+        if len(ticks) > self.capacity:
+            skipped = len(ticks) - self.capacity
+            ticks = ticks[skipped:]
+        else:
+            skipped = 0
+        overflow = max(0, self.size + len(ticks) - self.capacity)
+        self._start = (self._start + overflow) % self.capacity
+        self.size -= overflow
+        end = (self._start + self.size) % self.capacity
+        first_part = min(len(ticks), self.capacity - end)
+        self._data[end:end + first_part] = ticks[:first_part]
+        self._data[:len(ticks) - first_part] = ticks[first_part:]
+        self.size += len(ticks)
+        self.dropped += overflow + skipped
+        return overflow + skipped
+
+    def drain(self) -> np.ndarray:
+        """
+        Takes all buffered ticks out of the buffer.
+
+        :return: copy of the ticks, oldest first.
+        """
+        end = self._start + self.size
+        if end <= self.capacity:
+            ticks = self._data[self._start:end].copy()
+        else:
+            ticks = np.concatenate((self._data[self._start:], self._data[:end - self.capacity]))
+        self._start = 0
+        self.size = 0
+        return ticks
+
+
+class CaptureStats(NamedTuple):
+    """
+    A NamedTuple representing capture metrics of a symbol.
+    Attributes:
+
+    CAPTURED (int):
+        Ticks received from the source.
+    BUFFERED (int):
+        Ticks waiting in the ring buffer.
+    WRITING (int):
+        Ticks handed over to the writer thread and not written yet.
+    FLUSHED (int):
+        Ticks successfully written to files.
+    FAILED (int):
+        Ticks of batches the writers failed to save.
+    DROPPED (int):
+        Ticks lost due to ring buffer overflow.
+    REFETCHED (int):
+        Polls repeated with a bigger count, because a full page held only ticks captured before.
+    LAG_MS (int):
+        Time between the last poll and the last captured tick.
+    """
+    CAPTURED: int
+    BUFFERED: int
+    WRITING: int
+    FLUSHED: int
+    FAILED: int
+    DROPPED: int
+    REFETCHED: int
+    LAG_MS: int
+
+
+class SymbolState:
+    """Capture state of one symbol."""
+
+    def __init__(self, buffer_size: int, start_msc: int):
+        self.buffer = TickRingBuffer(buffer_size)
+        self.last_time_msc = start_msc
+        # Ticks already captured with time_msc == last_time_msc, a poll returns them again
+        self.seen_at_last = 0
+        self.captured = 0
+        self.writing = 0
+        self.flushed = 0
+        self.failed = 0
+        self.refetched = 0
+        self.lag_ms = 0
+
+
+class LiveCapture:
+    """
+    Records new ticks of subscribed symbols while the terminal runs.
+
+    Every symbol is polled from its last seen time_msc, new ticks go to a preallocated ring buffer
+    and are flushed to the writers of the chosen format in batches,
+    when a buffer reaches flush_size or flush_interval passes.
+    Files are written on a background thread, so polling isn't blocked by the disk.
+    """
+
+    def __init__(self, symbols: tuple, format_: Formats, source: TickSource | None = None,
+                 compression: Compression = Compression.NONE, broker: str = '',
+                 buffer_size: int = 65536, flush_size: int = 16384, flush_interval: float = 5.0,
+                 poll_interval: float = 0.1, poll_count: int = 10000, max_pending: int = 16,
+                 clock=time.time):
+        """
+        :param symbols: tuple of symbols to capture.
+        :param format_: format of flushed files.
+        :param source: source of ticks, the MetaTrader5 terminal if None.
+        :param compression: codec to compress flushed files with.
+        :param broker: name of broker for file names.
+        :param buffer_size: capacity of the ring buffer of every symbol.
+        :param flush_size: amount of buffered ticks of a symbol which triggers a flush.
+        :param flush_interval: seconds between flushes of all buffered ticks.
+        :param poll_interval: seconds between polls of all symbols.
+        :param poll_count: maximum ticks requested from the source in one request.
+        :param max_pending: batches queued to the writer thread before flushing blocks polling.
+        :param clock: function returning current time in seconds.
+        """
+        for name, value in (('buffer_size', buffer_size), ('poll_count', poll_count),
+                            ('max_pending', max_pending)):
+            if value < 1:
+                raise ValueError(f'{name} must be at least 1, got {value}')
+        self.format_ = format_
+        self.source = source or MT5TickSource()
+        self.compression = compression
+        self.broker = broker
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.poll_interval = poll_interval
+        self.poll_count = poll_count
+        self.max_pending = max_pending
+        self.clock = clock
+        start_msc = int(clock() * 1000)
+        self.states = {symbol: SymbolState(buffer_size, start_msc) for symbol in symbols}
+        self.template = Template(
+                'capture_${format}/${symbol}_${broker}_${time_from}_${time_to}.$format_extension'
+        )
+        self._last_flush = clock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='capture-writer')
+        self._pending: list[Future] = []
+        # Guards writing, flushed and failed counters updated by the writer thread
+        self._stats_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def poll_symbol(self, symbol: str) -> int:
+        """
+        Gets new ticks of a symbol from the source into its buffer.
+        Requests are repeated until the source has no more ticks, so a poll catches up completely.
+
+        :param symbol: subscribed symbol.
+        :return: amount of new ticks, -1 if the source failed.
+        """
+        state = self.states[symbol]
+        received = 0
+        count = self.poll_count
+        while True:
+            ticks = self.source.copy_ticks_from(symbol, state.last_time_msc // 1000, count)
+            if ticks is None:
+                logger.error('Can\'t get live ticks of %s', symbol)
+                received = -1
+                break
+            # The source works with seconds, skip ticks captured by previous polls
+            start = np.searchsorted(ticks['time_msc'], state.last_time_msc) + state.seen_at_last
+            new_ticks = ticks[start:]
+            if len(new_ticks):
+                self.buffer_ticks(state, new_ticks)
+                received += len(new_ticks)
+            if len(ticks) < count:
+                break
+            if not len(new_ticks):
+                # The page is full of ticks of the last second captured before, ask for more
+                count *= 2
+                state.refetched += 1
+        state.lag_ms = int(self.clock() * 1000) - state.last_time_msc
+        return received
+
+    @staticmethod
+    def buffer_ticks(state: SymbolState, new_ticks: np.ndarray):
+        """Pushes new ticks to the buffer and moves the last seen time_msc of the symbol."""
+        state.buffer.push(new_ticks)
+        last_time_msc = int(new_ticks['time_msc'][-1])
+        same_ms = int(np.count_nonzero(new_ticks['time_msc'] == last_time_msc))
+        state.seen_at_last = same_ms + (state.seen_at_last if last_time_msc == state.last_time_msc else 0)
+        state.last_time_msc = last_time_msc
+        state.captured += len(new_ticks)
+
+    def poll(self) -> int:
+        """
+        Polls all subscribed symbols once and flushes buffers if a trigger fired.
+
+        :return: amount of new ticks of all symbols.
+        """
+        received = sum(max(self.poll_symbol(symbol), 0) for symbol in self.states)
+        self.flush(force=self.clock() - self._last_flush >= self.flush_interval)
+        return received
+
+    def flush(self, force: bool = False) -> int:
+        """
+        Hands buffered ticks over to the writer thread.
+        Blocks while max_pending batches are queued, meanwhile new ticks wait in the ring buffers.
+
+        :param force: flush all non-empty buffers, otherwise only buffers reaching flush_size.
+        :return: amount of ticks handed over.
+        """
+        handed_over = 0
+        for symbol, state in self.states.items():
+            if not state.buffer.size or (not force and state.buffer.size < self.flush_size):
+                continue
+            self._wait_for_writer(self.max_pending - 1)
+            ticks = state.buffer.drain()
+            with self._stats_lock:
+                state.writing += len(ticks)
+            handed_over += len(ticks)
+            future = self._writer.submit(self.save_batch, symbol, ticks)
+            future.add_done_callback(
+                lambda done, state=state, symbol=symbol, size=len(ticks):
+                self._batch_done(done, state, symbol, size))
+            self._pending.append(future)
+        if force:
+            self._last_flush = self.clock()
+        return handed_over
+
+    def _wait_for_writer(self, max_pending: int):
+        self._pending = [future for future in self._pending if not future.done()]
+        while len(self._pending) > max_pending:
+            wait(self._pending, return_when=FIRST_COMPLETED)
+            self._pending = [future for future in self._pending if not future.done()]
+
+    def _batch_done(self, future: Future, state: SymbolState, symbol: str, size: int):
+        with self._stats_lock:
+            state.writing -= size
+            if future.exception() is None:
+                state.flushed += size
+            else:
+                state.failed += size
+        if future.exception() is not None:
+            logger.error('ERROR while saving %i captured ticks of %s, %s',
+                         size, symbol, future.exception())
+
+    def save_batch(self, symbol: str, ticks: np.ndarray) -> Path:
+        """
+        Saves a batch of ticks to a file using writers of the chosen format.
+
+        :param symbol: symbol of the ticks.
+        :param ticks: array of ticks.
+        :return: path of the saved file.
+        """
+        format_name = self.format_.value
+        Path(f'capture_{format_name}').mkdir(parents=True, exist_ok=True)
+        out_filename = self.template.substitute(
+            format=format_name,
+            symbol=symbol,
+            broker=self.broker,
+            time_from=int(ticks['time_msc'][0]),
+            time_to=int(ticks['time_msc'][-1]),
+            format_extension=format_name)
+        if self.compression is not Compression.NONE:
+            out_filename += f'.{self.compression.value}'
+        path = Path(out_filename).resolve()
+        ticks_file = Ticks(
+            TITLE=symbol,
+            DATAFRAME=pd.DataFrame(ticks),
+            DATE_FROM=datetime.fromtimestamp(int(ticks['time'][0]), tz=pytz.utc),
+            DATE_TO=datetime.fromtimestamp(int(ticks['time'][-1]), tz=pytz.utc),
+            BROKER=self.broker,
+        )
+        with open_compressed(path, self.compression) as stream:
+            write_ticks(ticks_file, self.format_, stream)
+        return path
+
+    def stats(self) -> dict[str, CaptureStats]:
+        """Returns capture metrics by symbol."""
+        with self._stats_lock:
+            return {
+                symbol: CaptureStats(
+                    CAPTURED=state.captured,
+                    BUFFERED=state.buffer.size,
+                    WRITING=state.writing,
+                    FLUSHED=state.flushed,
+                    FAILED=state.failed,
+                    DROPPED=state.buffer.dropped,
+                    REFETCHED=state.refetched,
+                    LAG_MS=state.lag_ms,
+                )
+                for symbol, state in self.states.items()
+            }
+
+    def run(self, duration: float | None = None) -> bool:
+        """
+        Polls symbols until stopped or duration passes, then flushes the rest.
+        Buffered ticks are flushed even if polling fails.
+
+        :param duration: seconds to capture, until stop() if None.
+        :return: False if capture stopped on an error.
+        """
+        logger.info('Capturing live ticks of %i symbols', len(self.states))
+        finish = None if duration is None else self.clock() + duration
+        try:
+            while not self._stop.is_set() and (finish is None or self.clock() < finish):
+                started = self.clock()
+                self.poll()
+                self._stop.wait(max(0.0, self.poll_interval - (self.clock() - started)))
+        except Exception:
+            logger.exception('ERROR while capturing live ticks')
+            return False
+        finally:
+            self.close()
+            logger.info('Live capture stopped, %i ticks captured',
+                        sum(state.captured for state in self.states.values()))
+        return True
+
+    def close(self):
+        """Flushes the rest of buffered ticks and waits until all batches are written."""
+        self.flush(force=True)
+        self._writer.shutdown(wait=True)
+
+    def start(self):
+        """Runs capture on a background thread."""
+        self._thread = threading.Thread(target=self.run, name='live-capture', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops capture and waits until buffered ticks are written."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
@@ -0,0 +1,206 @@
+"""
+Compression and archiving options for saved ticks
+"""
+import gzip
+import io
+import lzma
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from contextlib import contextmanager
+from enum import Enum
+from pathlib import Path
+from typing import BinaryIO, Iterator
+from datatypes import Ticks, Formats
+
+try:
+    import zstandard as zstd
+except ImportError:  # zstandard is optional, only needed for .zst outputs
+    zstd = None
+
+# Formats whose writers produce bytes instead of text
+BINARY_FORMATS = {Formats.PKL, Formats.XML, Formats.XLSX, Formats.TKS}
+# Formats whose writers seek back over written data (xlsx is a zip built by openpyxl),
+# compressed streams can't do that, so these are written to a temporary file first
+SEEKING_FORMATS = {Formats.XLSX}
+# Spooled files are kept in memory up to this size before spilling to disk
+SPOOL_SIZE = 64 * 1024 * 1024
+
+
+class Compression(Enum):
+    """
+    Enumeration of possible compression codecs for saved files.
+    """
+    NONE = ''
+    GZIP = 'gz'
+    ZSTD = 'zst'
+    XZ = 'xz'
+
+
+class Archive(Enum):
+    """
+    Enumeration of possible archives bundling all files of one run.
+    """
+    NONE = ''
+    ZIP = 'zip'
+    TAR_ZST = 'tar.zst'
+
+
+# Accepted compression levels, they differ between codecs: deflate of zip, gzip and xz take 0-9,
+# zstd takes 1-22
+LEVELS = {
+    Compression.GZIP: range(0, 10),
+    Compression.ZSTD: range(1, 23),
+    Compression.XZ: range(0, 10),
+    Archive.ZIP: range(0, 10),
+    Archive.TAR_ZST: range(1, 23),
+}
+
+
+def check_level(codec: Compression | Archive, level: int | None):
+    """
+    Raises ValueError if the level is out of the codec's range.
+
+    :param codec: compression or archive the level is used for.
+    :param level: compression level, None for the codec default.
+    """
+    levels = LEVELS.get(codec)
+    if level is not None and levels is not None and level not in levels:
+        raise ValueError(f'{codec.name} compression level must be '
+                         f'from {levels.start} to {levels.stop - 1}, got {level}')
+
+
+def _require_zstd():
+    if zstd is None:
+        raise RuntimeError('zstd compression requires the "zstandard" package')
+
+
+def _zstd_compressor(level: int, threads: int) -> 'zstd.ZstdCompressor':
+    _require_zstd()
+    return zstd.ZstdCompressor(level=level, threads=threads)
+
+
+@contextmanager
+def open_compressed(path: Path, compression: Compression,
+                    level: int | None = None, threads: int = -1) -> Iterator[BinaryIO]:
+    """
+    Opens a binary stream which compresses data as it is written.
+
+    :param path: output file path, the compression suffix is expected to be already appended.
+    :param compression: codec to use.
+    :param level: codec specific compression level, see LEVELS, codec default if None.
+    :param threads: number of zstd worker threads, -1 to use all logical cores.
+    :return: writable binary stream.
+    """
+    check_level(compression, level)
+    match compression:
+        case Compression.NONE:
+            stream = open(path, 'wb')
+        case Compression.GZIP:
+            stream = gzip.open(path, 'wb', compresslevel=9 if level is None else level)
+        case Compression.XZ:
+            stream = lzma.open(path, 'wb', preset=level)
+        case Compression.ZSTD:
+            compressor = _zstd_compressor(3 if level is None else level, threads)
+            raw = open(path, 'wb')
+            stream = compressor.stream_writer(raw, closefd=True)
+        case _:
+            raise ValueError(f'Unknown compression {compression}')
+    try:
+        yield stream
+    finally:
+        stream.close()
+
+
+def write_ticks(ticks_file: Ticks, format_: Formats, stream: BinaryIO):
+    """
+    Writes ticks to an already opened binary stream in the given format.
+
+    :param ticks_file: ticks to write.
+    :param format_: format from Formats class.
+    :param stream: writable binary stream, it is left open.
+    """
+    save = Formats.save_match_format(ticks_file, format_)
+    if not save:
+        raise ValueError(f'Unsupported format {format_}')
+    if format_ in SEEKING_FORMATS:
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as spool:
+            save(spool)
+            spool.seek(0)
+            shutil.copyfileobj(spool, stream)
+        return
+    if format_ in BINARY_FORMATS:
+        save(stream)
+        return
+    text_stream = io.TextIOWrapper(stream, encoding='utf-8', newline='', write_through=True)
+    try:
+        save(text_stream)
+        text_stream.flush()
+    finally:
+        # Detach so closing the wrapper doesn't close the underlying stream
+        text_stream.detach()
+
+
+class ArchiveWriter:
+    """
+    Bundles ticks files of one run into a single archive.
+    Members are compressed while being written.
+    """
+
+    def __init__(self, path: Path, archive: Archive, level: int | None = None, threads: int = -1):
+        """
+        :param path: output archive path.
+        :param archive: archive type from Archive class.
+        :param level: archive specific compression level, see LEVELS, codec default if None.
+        :param threads: number of zstd worker threads, -1 to use all logical cores.
+        """
+        check_level(archive, level)
+        self.path = path
+        self.archive = archive
+        match archive:
+            case Archive.ZIP:
+                self._zip = zipfile.ZipFile(
+                    path, 'w', compression=zipfile.ZIP_DEFLATED,
+                    compresslevel=level, allowZip64=True)
+            case Archive.TAR_ZST:
+                compressor = _zstd_compressor(3 if level is None else level, threads)
+                self._raw = open(path, 'wb')
+                self._zstd_stream = compressor.stream_writer(self._raw, closefd=True)
+                self._tar = tarfile.open(fileobj=self._zstd_stream, mode='w|')
+            case _:
+                raise ValueError(f'Unknown archive {archive}')
+
+    def add(self, name: str, ticks_file: Ticks, format_: Formats):
+        """
+        Writes ticks as a new member of the archive.
+
+        :param name: member name inside the archive.
+        :param ticks_file: ticks to write.
+        :param format_: format from Formats class.
+        """
+        if self.archive is Archive.ZIP:
+            with self._zip.open(name, 'w', force_zip64=True) as member:
+                write_ticks(ticks_file, format_, member)
+            return
+        # Tar headers need the member size before its data,
+        # so each member is spooled first and then streamed into the compressor.
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as spool:
+            write_ticks(ticks_file, format_, spool)
+            tar_info = tarfile.TarInfo(name)
+            tar_info.size = spool.tell()
+            spool.seek(0)
+            self._tar.addfile(tar_info, spool)
+
+    def close(self):
+        if self.archive is Archive.ZIP:
+            self._zip.close()
+        else:
+            self._tar.close()
+            self._zstd_stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1 @@
+"""Makes modules of the repository root importable by tests"""
@@ -2,9 +2,11 @@
 Ticks and Formats data structures
 """
 from datetime import datetime
+from functools import partial
 from typing import NamedTuple, Callable
 from enum import Enum
 import pandas as pd
+from tickarchive import write_tick_archive
 
 
 class Ticks(NamedTuple):
@@ -40,6 +42,7 @@ class Formats(Enum):
     JSON = 'json'
     XML = 'xml'
     XLSX = 'xlsx'
+    TKS = 'tks'
 
     @classmethod
     def save_match_format(cls, ticks_file: Ticks, format_) -> Callable | bool:
@@ -57,5 +60,6 @@ class Formats(Enum):
             Formats.JSON: ticks_file.DATAFRAME.to_json,
             Formats.XML:  ticks_file.DATAFRAME.to_xml,
             Formats.XLSX: ticks_file.DATAFRAME.to_excel,
+            Formats.TKS:  partial(write_tick_archive, ticks_file.DATAFRAME),
         }
         return False if format_ not in formats else formats.get(format_)
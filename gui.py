@@ -5,6 +5,7 @@ from tkinter import ttk, messagebox
 from datetime import datetime
 from accounts import Accounts
 from ticksgetter import logger, Formats, TicksGetter
+from compression import Compression, Archive
 
 LABELS_FONT = '0 10 bold'
 TITLE_FONT = '0 12 italic'
@@ -24,8 +25,39 @@ class ExportFrame(tk.Frame):
             font=LABELS_FONT,
             background=self['bg'])
         self.format_combobox = self.create_format_combobox()
+        self.compression_label = ttk.Label(
+            self,
+            text="Compression",
+            font=LABELS_FONT,
+            background=self['bg'])
+        self.compression_combobox = self.create_enum_combobox(Compression)
+        self.archive_label = ttk.Label(
+            self,
+            text="Archive",
+            font=LABELS_FONT,
+            background=self['bg'])
+        self.archive_combobox = self.create_enum_combobox(Archive)
         self.format_label.grid(row=3, column=0, **WIDGET_ARGS)
         self.format_combobox.grid(row=3, column=1, **WIDGET_ARGS)
+        self.compression_label.grid(row=4, column=0, **WIDGET_ARGS)
+        self.compression_combobox.grid(row=4, column=1, **WIDGET_ARGS)
+        self.archive_label.grid(row=5, column=0, **WIDGET_ARGS)
+        self.archive_combobox.grid(row=5, column=1, **WIDGET_ARGS)
+        self.ram_budget_label = ttk.Label(
+            self,
+            text="RAM budget, MB",
+            font=LABELS_FONT,
+            background=self['bg'])
+        self.ram_budget_spinbox = tk.Spinbox(
+            self,
+            from_=64,
+            to=65536,
+            increment=64,
+            width=6)
+        self.ram_budget_spinbox.delete(0, tk.END)
+        self.ram_budget_spinbox.insert(0, '1024')
+        self.ram_budget_label.grid(row=6, column=0, **WIDGET_ARGS)
+        self.ram_budget_spinbox.grid(row=6, column=1, **WIDGET_ARGS)
 
     def create_format_combobox(self) -> ttk.Combobox:
         """Creates combobox of saving formats.
@@ -37,6 +69,16 @@ class ExportFrame(tk.Frame):
         format_combobox.set('Select format...')
         return format_combobox
 
+    def create_enum_combobox(self, enum) -> ttk.Combobox:
+        """Creates combobox of compression or archive options, 'NONE' is selected by default.
+
+        :rtype: ttk.Combobox
+        """
+        enum_combobox = ttk.Combobox(self, values=[i.name for i in enum],
+                                     width=13, state='readonly')
+        enum_combobox.set(enum.NONE.name)
+        return enum_combobox
+
     def get_chosen_format(self) -> Formats:
         try:
             selection = self.format_combobox.get()
@@ -44,6 +86,20 @@ class ExportFrame(tk.Frame):
         except KeyError:
             logger.warning('Select saving format')
 
+    def get_chosen_compression(self) -> Compression:
+        return Compression[self.compression_combobox.get()]
+
+    def get_chosen_archive(self) -> Archive:
+        return Archive[self.archive_combobox.get()]
+
+    def get_ram_budget(self) -> int:
+        """Returns RAM budget from the spinbox in bytes."""
+        try:
+            return int(self.ram_budget_spinbox.get()) * 1024 ** 2
+        except ValueError:
+            logger.warning('RAM budget must be a whole number of MB, using 1024 MB')
+            return 1024 ** 3
+
 
 class LoginFrame(tk.Frame):
     """Frame containing login form (spinbox, label and connection indicator)"""
@@ -241,8 +297,9 @@ class DatesFrame(tk.LabelFrame):
 
     def set_dates_to_tickparser(self, dates: dict[str, datetime]):
 
-        self.parent.ticks_getter.utc_from = dates['from_date']
-        self.parent.ticks_getter.utc_to = dates['to_date']
+        timezone = self.parent.ticks_getter.timezone
+        self.parent.ticks_getter.utc_from = timezone.localize(dates['from_date'])
+        self.parent.ticks_getter.utc_to = timezone.localize(dates['to_date'])
 
 
 class SymbolsTreeviewsFrame(tk.Frame):
@@ -371,8 +428,15 @@ class SettingsFrame(tk.LabelFrame):
         if chosen_symbols and format_:
             if dates := self.dates_frame.get_dates_from_spinboxes():
                 self.dates_frame.set_dates_to_tickparser(dates)
-                self.ticks_getter.get_ticks(chosen_symbols)
-                self.ticks_getter.save_ticks_to_file(format_=format_)
+                self.ticks_getter.ram_budget = self.export_frame.get_ram_budget()
+                fetch_plan = self.ticks_getter.plan_ticks(chosen_symbols)
+                if not fetch_plan or not messagebox.askokcancel('Fetch plan', fetch_plan.describe()):
+                    return
+                self.ticks_getter.get_ticks_to_file(
+                    chosen_symbols,
+                    format_=format_,
+                    compression=self.export_frame.get_chosen_compression(),
+                    archive=self.export_frame.get_chosen_archive())
 
 
 class LoggerFrame(tk.Frame):
@@ -8,8 +8,10 @@ logger = logging.getLogger(__name__)
 logfile = logging.FileHandler(f'logs/{datetime.now().strftime("%Y-%m-%d")}.log')
 log_format = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
 logfile.setFormatter(log_format)
-logger.addHandler(logfile)
 logging.basicConfig(datefmt="%d-%m-%y %H:%M:%S", level=logging.INFO)
+# Attached to the root logger after basicConfig, which does nothing once root has a handler,
+# so logs of every module get to both the console and the file
+logging.getLogger().addHandler(logfile)
 
 
 if __name__ == "__main__":
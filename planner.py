@@ -0,0 +1,241 @@
+"""
+Fetch planner estimating ticks volume before downloading
+"""
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import NamedTuple
+import MetaTrader5 as mt5
+
+logger = logging.getLogger(__name__)
+
+# Points spread over the range, from each of them the next PROBE_COUNT ticks are requested
+PROBE_POINTS = 12
+PROBE_COUNT = 1000
+# A probe point is in trading hours if its first tick comes within this time
+ACTIVE_GAP = timedelta(minutes=5)
+# Size of one tick of mt5.copy_ticks_* output, used if probes return nothing
+DEFAULT_TICK_SIZE = 60
+# Collected ticks are saved in parts of a third of the budget: while a part is concatenated
+# it is held twice, as fetched chunks and as one DataFrame.
+# A chunk is estimated to take a sixth: it is held twice while converted from numpy to a DataFrame.
+# The rest of the budget is left for temporaries of pandas. Buffers of the writers aren't bounded
+# by the budget, e.g. to_csv formats a lot of rows at once.
+PART_SHARE = 3
+CHUNK_SHARE = 6
+MIN_CHUNK_DURATION = timedelta(minutes=1)
+# Chunk duration used when the density of ticks is unknown, because every probe failed
+DEFAULT_CHUNK_DURATION = timedelta(hours=1)
+
+
+class SymbolEstimate(NamedTuple):
+    """
+    A NamedTuple representing the estimated volume of one symbol's ticks.
+    Attributes:
+
+    SYMBOL (str):
+        Title of the symbol.
+    TICKS_PER_SECOND (float | None):
+        Average density of ticks in trading hours, None if unknown.
+    PEAK_TICKS_PER_SECOND (float | None):
+        Highest density of ticks over probes, used to size chunks, None if unknown.
+    ESTIMATED_TICKS (int | None):
+        Estimated amount of ticks in the whole range, None if unknown.
+    ESTIMATED_BYTES (int | None):
+        Estimated size of the ticks in memory, None if unknown.
+    CHUNK_DURATION (timedelta):
+        Duration of one chunk to request from the terminal.
+    CHUNKS (int):
+        Amount of chunks to cover the whole range.
+    """
+    SYMBOL: str
+    TICKS_PER_SECOND: float | None
+    PEAK_TICKS_PER_SECOND: float | None
+    ESTIMATED_TICKS: int | None
+    ESTIMATED_BYTES: int | None
+    CHUNK_DURATION: timedelta
+    CHUNKS: int
+
+
+class FetchPlan(NamedTuple):
+    """
+    A NamedTuple representing the plan of the whole run.
+    Attributes:
+
+    ESTIMATES (dict[str, SymbolEstimate]):
+        Estimates by symbol.
+    RAM_BUDGET (int):
+        Memory budget in bytes the plan is fitted to.
+    PART_BYTES (int):
+        Maximum size of ticks held before they are saved.
+    DATE_FROM (datetime):
+        Starting date of ticks.
+    DATE_TO (datetime):
+        Ending date of ticks.
+    """
+    ESTIMATES: dict[str, SymbolEstimate]
+    RAM_BUDGET: int
+    PART_BYTES: int
+    DATE_FROM: datetime
+    DATE_TO: datetime
+
+    @property
+    def total_ticks(self) -> int:
+        return sum(estimate.ESTIMATED_TICKS or 0 for estimate in self.ESTIMATES.values())
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(estimate.ESTIMATED_BYTES or 0 for estimate in self.ESTIMATES.values())
+
+    def describe(self) -> str:
+        """
+        Builds human-readable description of the plan.
+
+        :return: multiline string, one line per symbol and a total.
+        """
+        lines = [f'Plan from {self.DATE_FROM} to {self.DATE_TO}, '
+                 f'RAM budget {format_bytes(self.RAM_BUDGET)}, '
+                 f'ticks saved in parts up to {format_bytes(self.PART_BYTES)}']
+        for estimate in self.ESTIMATES.values():
+            if estimate.ESTIMATED_TICKS is None:
+                volume = 'unknown volume'
+            else:
+                volume = (f'~{estimate.ESTIMATED_TICKS:,} ticks, '
+                          f'~{format_bytes(estimate.ESTIMATED_BYTES)}')
+            lines.append(f'{estimate.SYMBOL}: {volume}, '
+                         f'{estimate.CHUNKS} chunk(s) of {estimate.CHUNK_DURATION}')
+        lines.append(f'Total: ~{self.total_ticks:,} ticks, ~{format_bytes(self.total_bytes)}')
+        return '\n'.join(lines)
+
+
+def format_bytes(size: float) -> str:
+    """Formats amount of bytes to a human-readable string."""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024:
+            return f'{size:.1f} {unit}'
+        size /= 1024
+    return f'{size:.1f} TB'
+
+
+def probe_symbol(symbol: str, utc_from: datetime,
+                 utc_to: datetime) -> tuple[list[float], float, int] | None:
+    """
+    Requests PROBE_COUNT ticks from points evenly spread over the range to measure ticks density.
+    Ticks are requested from a point on, so a point outside trading hours still measures
+    the next session instead of an empty window.
+
+    :param symbol: symbol to probe.
+    :param utc_from: starting date of the range.
+    :param utc_to: ending date of the range, timezone-aware.
+    :return: ticks per second measured from every point, share of points in trading hours
+        and size of one tick in bytes. Densities are empty if probes found less than 2 ticks
+        in the range. None if every probe failed.
+    """
+    utc_to_msc = int(utc_to.timestamp() * 1000)
+    step = (utc_to - utc_from) / PROBE_POINTS
+    densities = []
+    active_points = 0
+    failed_points = 0
+    tick_size = DEFAULT_TICK_SIZE
+    for point in range(PROBE_POINTS):
+        probe_from = utc_from + step * point
+        ticks = mt5.copy_ticks_from(symbol, probe_from, PROBE_COUNT, mt5.COPY_TICKS_ALL)
+        if ticks is None:
+            logger.warning('Probe of %s failed, MT Last error - %s', symbol, mt5.last_error())
+            failed_points += 1
+            continue
+        ticks = ticks[ticks['time_msc'] <= utc_to_msc]
+        if len(ticks) < 2:
+            continue
+        tick_size = ticks.dtype.itemsize
+        first_msc, last_msc = int(ticks['time_msc'][0]), int(ticks['time_msc'][-1])
+        if first_msc - probe_from.timestamp() * 1000 <= ACTIVE_GAP.total_seconds() * 1000:
+            active_points += 1
+        densities.append(len(ticks) * 1000 / max(last_msc - first_msc, 1))
+    if failed_points == PROBE_POINTS:
+        return None
+    return densities, max(active_points, 1) / PROBE_POINTS, tick_size
+
+
+def estimate_symbol(symbol: str, utc_from: datetime, utc_to: datetime,
+                    chunk_budget: int) -> SymbolEstimate:
+    """
+    Estimates volume of symbol's ticks and picks a chunk duration fitting the budget.
+
+    :param symbol: symbol to estimate.
+    :param utc_from: starting date of the range, timezone-aware.
+    :param utc_to: ending date of the range, timezone-aware.
+    :param chunk_budget: memory in bytes available for one chunk.
+    :return: SymbolEstimate of the symbol.
+    """
+    range_duration = utc_to - utc_from
+    probes = probe_symbol(symbol, utc_from, utc_to)
+    if probes is None:
+        logger.warning('Density of %s ticks is unknown, using chunks of %s',
+                       symbol, DEFAULT_CHUNK_DURATION)
+        chunk_duration = min(DEFAULT_CHUNK_DURATION, range_duration)
+        return SymbolEstimate(
+            SYMBOL=symbol,
+            TICKS_PER_SECOND=None,
+            PEAK_TICKS_PER_SECOND=None,
+            ESTIMATED_TICKS=None,
+            ESTIMATED_BYTES=None,
+            CHUNK_DURATION=chunk_duration,
+            CHUNKS=math.ceil(range_duration / chunk_duration),
+        )
+
+    densities, active_share, tick_size = probes
+    if not densities:
+        # The first probe asks for PROBE_COUNT ticks from the range start,
+        # so less than 2 of them in the range means the range is nearly empty
+        return SymbolEstimate(
+            SYMBOL=symbol,
+            TICKS_PER_SECOND=0.0,
+            PEAK_TICKS_PER_SECOND=0.0,
+            ESTIMATED_TICKS=0,
+            ESTIMATED_BYTES=0,
+            CHUNK_DURATION=range_duration,
+            CHUNKS=1,
+        )
+    density = sum(densities) / len(densities)
+    peak_density = max(densities)
+    estimated_ticks = int(density * active_share * range_duration.total_seconds())
+    chunk_seconds = chunk_budget / (peak_density * tick_size)
+    # Whole minutes, so parts of a day get distinct filenames
+    chunk_duration = max(MIN_CHUNK_DURATION, timedelta(minutes=int(chunk_seconds // 60)))
+    chunk_duration = min(chunk_duration, range_duration)
+
+    return SymbolEstimate(
+        SYMBOL=symbol,
+        TICKS_PER_SECOND=density,
+        PEAK_TICKS_PER_SECOND=peak_density,
+        ESTIMATED_TICKS=estimated_ticks,
+        ESTIMATED_BYTES=estimated_ticks * tick_size,
+        CHUNK_DURATION=chunk_duration,
+        CHUNKS=math.ceil(range_duration / chunk_duration),
+    )
+
+
+def plan_fetch(symbols: tuple, utc_from: datetime, utc_to: datetime, ram_budget: int) -> FetchPlan:
+    """
+    Builds a plan of fetching ticks of symbols fitted to the memory budget.
+
+    :param symbols: tuple of symbols.
+    :param utc_from: starting date of ticks, timezone-aware.
+    :param utc_to: ending date of ticks, timezone-aware, must be later than utc_from.
+    :param ram_budget: memory budget in bytes.
+    :return: FetchPlan of the run.
+    """
+    estimates = {
+        symbol: estimate_symbol(symbol, utc_from, utc_to, ram_budget // CHUNK_SHARE)
+        for symbol in symbols
+    }
+    plan = FetchPlan(
+        ESTIMATES=estimates,
+        RAM_BUDGET=ram_budget,
+        PART_BYTES=ram_budget // PART_SHARE,
+        DATE_FROM=utc_from,
+        DATE_TO=utc_to,
+    )
+    logger.info('%s\n', plan.describe())
+    return plan
@@ -0,0 +1,162 @@
+"""Tests of live capture against FakeTickSource"""
+import threading
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+from capture import FakeTickSource, LiveCapture
+from datatypes import Formats
+from tickarchive import read_tick_archive
+
+START = 1_700_000_000.0
+
+
+class FakeClock:
+    """Clock moved by tests instead of real time."""
+
+    def __init__(self, now: float = START):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+def run_capture(capture: LiveCapture, clock: FakeClock, polls: int, step: float):
+    for _ in range(polls):
+        clock.now += step
+        capture.poll()
+    capture.close()
+
+
+def read_captured(symbol: str) -> pd.DataFrame:
+    files = sorted(Path('capture_tks').glob(f'{symbol}_*.tks'))
+    return pd.concat([read_tick_archive(path) for path in files], ignore_index=True)
+
+
+def test_capture_keeps_up_when_a_second_holds_more_ticks_than_poll_count():
+    clock = FakeClock()
+    source = FakeTickSource(rate=2000, clock=clock, seed=1)
+    capture = LiveCapture(('EURUSD',), Formats.TKS, source=source, poll_count=500,
+                          flush_interval=1.0, clock=clock)
+    run_capture(capture, clock, polls=40, step=0.5)
+
+    expected = source.generated('EURUSD')
+    captured = read_captured('EURUSD')
+    stats = capture.stats()['EURUSD']
+    assert len(expected) > 30_000
+    assert np.array_equal(captured['time_msc'].to_numpy(), expected['time_msc'])
+    assert np.array_equal(captured['bid'].to_numpy(), expected['bid'])
+    assert stats.CAPTURED == stats.FLUSHED == len(expected)
+    assert stats.DROPPED == stats.FAILED == stats.WRITING == stats.BUFFERED == 0
+    assert stats.REFETCHED > 0
+
+
+def test_capture_of_many_symbols():
+    clock = FakeClock()
+    source = FakeTickSource(rate=50, clock=clock, seed=2)
+    symbols = tuple(f'SYMBOL{number}' for number in range(200))
+    capture = LiveCapture(symbols, Formats.TKS, source=source, flush_size=100, clock=clock)
+    run_capture(capture, clock, polls=20, step=0.25)
+
+    for symbol, stats in capture.stats().items():
+        assert stats.CAPTURED == stats.FLUSHED == len(source.generated(symbol))
+
+
+def test_lag_grows_without_new_ticks():
+    clock = FakeClock()
+    capture = LiveCapture(('EURUSD',), Formats.TKS, source=FakeTickSource(rate=0, clock=clock),
+                          clock=clock)
+    clock.now += 1
+    capture.poll()
+    clock.now += 2
+    capture.poll()
+    assert capture.stats()['EURUSD'].LAG_MS == 3000
+    capture.close()
+
+
+def test_ring_buffer_overflow_is_counted_as_dropped():
+    clock = FakeClock()
+    source = FakeTickSource(rate=1000, clock=clock, seed=3)
+    capture = LiveCapture(('EURUSD',), Formats.TKS, source=source, buffer_size=100,
+                          flush_size=10_000, flush_interval=60, clock=clock)
+    run_capture(capture, clock, polls=1, step=1)
+
+    stats = capture.stats()['EURUSD']
+    assert stats.FLUSHED == 100
+    assert stats.DROPPED == stats.CAPTURED - 100 > 0
+
+
+def test_failed_writes_are_not_counted_as_flushed(monkeypatch):
+    clock = FakeClock()
+    capture = LiveCapture(('EURUSD',), Formats.TKS, source=FakeTickSource(rate=100, clock=clock),
+                          clock=clock)
+
+    def fail(symbol, ticks):
+        raise OSError('disk is full')
+
+    monkeypatch.setattr(capture, 'save_batch', fail)
+    run_capture(capture, clock, polls=5, step=1)
+
+    stats = capture.stats()['EURUSD']
+    assert stats.FLUSHED == 0
+    assert stats.FAILED == stats.CAPTURED > 0
+
+
+def test_flush_blocks_while_writer_queue_is_full(monkeypatch):
+    clock = FakeClock()
+    capture = LiveCapture(('A', 'B', 'C'), Formats.TKS, source=FakeTickSource(rate=100, clock=clock),
+                          max_pending=1, clock=clock)
+    release = threading.Event()
+    monkeypatch.setattr(capture, 'save_batch', lambda symbol, ticks: release.wait())
+    clock.now += 1
+    capture.poll()
+
+    flusher = threading.Thread(target=capture.flush, kwargs={'force': True})
+    flusher.start()
+    flusher.join(timeout=0.2)
+    assert flusher.is_alive()
+    assert sum(stats.WRITING > 0 for stats in capture.stats().values()) == 1
+
+    release.set()
+    flusher.join()
+    capture.close()
+    assert all(stats.FLUSHED == stats.CAPTURED for stats in capture.stats().values())
+
+
+class FailingSource:
+    """Source moving the clock on every request and failing on the given request."""
+
+    def __init__(self, source: FakeTickSource, clock: FakeClock, fail_on: int):
+        self.source = source
+        self.clock = clock
+        self.requests_left = fail_on
+
+    def copy_ticks_from(self, symbol: str, date_from: int, count: int) -> np.ndarray | None:
+        self.requests_left -= 1
+        if not self.requests_left:
+            raise RuntimeError('terminal disconnected')
+        self.clock.now += 1
+        return self.source.copy_ticks_from(symbol, date_from, count)
+
+
+def test_buffered_ticks_are_flushed_when_polling_fails():
+    clock = FakeClock()
+    source = FakeTickSource(rate=100, clock=clock, seed=4)
+    capture = LiveCapture(('EURUSD',), Formats.TKS, source=FailingSource(source, clock, fail_on=4),
+                          poll_interval=0, flush_interval=60, clock=clock)
+
+    assert capture.run() is False
+    stats = capture.stats()['EURUSD']
+    assert stats.CAPTURED == stats.FLUSHED == len(read_captured('EURUSD')) > 0
+    assert stats.BUFFERED == stats.WRITING == 0
+
+
+@pytest.mark.parametrize('parameter', ['buffer_size', 'poll_count', 'max_pending'])
+def test_sizes_below_one_are_rejected(parameter):
+    with pytest.raises(ValueError, match=parameter):
+        LiveCapture(('EURUSD',), Formats.TKS, source=FakeTickSource(), **{parameter: 0})
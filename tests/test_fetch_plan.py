@@ -0,0 +1,137 @@
+"""Tests of fetch planning and partial fetching against a fake terminal"""
+import sys
+import types
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import pytest
+import pytz
+
+try:
+    import MetaTrader5  # noqa: F401
+except ImportError:  # The terminal package is Windows-only, every test patches in FakeTerminal
+    sys.modules['MetaTrader5'] = types.ModuleType('MetaTrader5')
+
+import planner
+import ticksgetter
+from capture import TICK_DTYPE
+from planner import CHUNK_SHARE, DEFAULT_CHUNK_DURATION, plan_fetch
+from ticksgetter import TicksGetter
+
+UTC_FROM = datetime(2021, 1, 4, tzinfo=pytz.utc)
+UTC_TO = datetime(2021, 1, 5, tzinfo=pytz.utc)
+RAM_BUDGET = 3_000_000
+
+
+class FakeTerminal:
+    """
+    Stands for the MetaTrader5 module.
+    EURUSD ticks every 100 ms from 08:00 to 20:00, with two ticks at every whole minute,
+    EMPTY has no ticks, BROKEN fails every request.
+    """
+    COPY_TICKS_ALL = -1
+
+    def __init__(self):
+        self.error = (1, 'Success')
+        self.range_calls: list[np.ndarray] = []
+
+    @staticmethod
+    def _ticks(symbol: str, from_msc: int, to_msc: int) -> np.ndarray:
+        if symbol == 'EMPTY':
+            return np.empty(0, dtype=TICK_DTYPE)
+        time_msc = np.arange(-(-from_msc // 100) * 100, to_msc + 1, 100, dtype=np.int64)
+        hours = time_msc // 3_600_000 % 24
+        time_msc = time_msc[(hours >= 8) & (hours < 20)]
+        time_msc = np.sort(np.concatenate((time_msc, time_msc[time_msc % 60_000 == 0])))
+        ticks = np.zeros(len(time_msc), dtype=TICK_DTYPE)
+        ticks['time_msc'] = time_msc
+        ticks['time'] = time_msc // 1000
+        ticks['bid'] = 1.1 + (time_msc % 1000) / 100_000
+        ticks['ask'] = ticks['bid'] + 0.0001
+        ticks['flags'] = 6
+        return ticks
+
+    def copy_ticks_from(self, symbol: str, date_from: datetime, count: int, flags: int):
+        if symbol == 'BROKEN':
+            self.error = (-1, 'Terminal: Call failed')
+            return None
+        from_msc = int(date_from.timestamp() * 1000)
+        return self._ticks(symbol, from_msc, from_msc + 86_400_000)[:count]
+
+    def copy_ticks_range(self, symbol: str, date_from: datetime, date_to: datetime, flags: int):
+        if symbol == 'BROKEN':
+            self.error = (-1, 'Terminal: Call failed')
+            return None
+        # Both ends are inclusive, like in the terminal
+        ticks = self._ticks(symbol, int(date_from.timestamp() * 1000),
+                            int(date_to.timestamp() * 1000))
+        self.range_calls.append(ticks)
+        return ticks
+
+    def last_error(self):
+        return self.error
+
+
+@pytest.fixture
+def terminal(monkeypatch) -> FakeTerminal:
+    fake = FakeTerminal()
+    monkeypatch.setattr(planner, 'mt5', fake)
+    monkeypatch.setattr(ticksgetter, 'mt5', fake)
+    return fake
+
+
+@pytest.fixture
+def getter(terminal) -> TicksGetter:
+    ticks_getter = TicksGetter()
+    ticks_getter.authorized = True
+    ticks_getter.company_name = 'Test Broker'
+    ticks_getter.utc_from, ticks_getter.utc_to = UTC_FROM, UTC_TO
+    ticks_getter.ram_budget = RAM_BUDGET
+    return ticks_getter
+
+
+def test_chunks_fit_the_budget(terminal):
+    estimate = plan_fetch(('EURUSD',), UTC_FROM, UTC_TO, RAM_BUDGET).ESTIMATES['EURUSD']
+    assert estimate.CHUNKS > 1
+    assert abs(estimate.ESTIMATED_TICKS - 432_720) / 432_720 < 0.01
+
+    busy_from = datetime(2021, 1, 4, 12, tzinfo=pytz.utc)
+    chunk = terminal.copy_ticks_range('EURUSD', busy_from, busy_from + estimate.CHUNK_DURATION,
+                                      FakeTerminal.COPY_TICKS_ALL)
+    assert chunk.nbytes <= RAM_BUDGET // CHUNK_SHARE
+
+
+def test_parts_are_bounded_and_join_without_duplicates(getter, terminal):
+    plan = getter.plan_ticks(('EURUSD',))
+    parts = []
+    assert getter.get_ticks(('EURUSD',), on_ticks=parts.append)
+
+    max_chunk_bytes = max(chunk.nbytes for chunk in terminal.range_calls)
+    assert max_chunk_bytes <= RAM_BUDGET // CHUNK_SHARE
+    assert len(parts) > 1
+    for part in parts:
+        assert part.DATAFRAME.to_records(index=False).nbytes <= plan.PART_BYTES + max_chunk_bytes
+    assert all(previous.DATE_TO == part.DATE_FROM for previous, part in zip(parts, parts[1:]))
+
+    joined = pd.concat([part.DATAFRAME for part in parts], ignore_index=True)
+    whole = terminal.copy_ticks_range('EURUSD', UTC_FROM, UTC_TO, FakeTerminal.COPY_TICKS_ALL)
+    assert joined.equals(pd.DataFrame(whole))
+
+
+def test_empty_range_is_fetched_in_one_chunk(terminal):
+    estimate = plan_fetch(('EMPTY',), UTC_FROM, UTC_FROM + timedelta(days=365),
+                          RAM_BUDGET).ESTIMATES['EMPTY']
+    assert estimate.CHUNKS == 1
+    assert estimate.ESTIMATED_TICKS == 0
+
+
+def test_failed_probes_fall_back_to_default_chunks(terminal):
+    estimate = plan_fetch(('BROKEN',), UTC_FROM, UTC_TO, RAM_BUDGET).ESTIMATES['BROKEN']
+    assert estimate.CHUNK_DURATION == DEFAULT_CHUNK_DURATION
+    assert estimate.CHUNKS == 24
+    assert estimate.ESTIMATED_TICKS is None
+
+
+def test_plan_rejects_empty_range(getter):
+    getter.utc_to = getter.utc_from
+    assert getter.plan_ticks(('EURUSD',)) is False
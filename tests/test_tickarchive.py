@@ -0,0 +1,113 @@
+"""Tests of the tick archive format round trips"""
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from tickarchive import TickArchiveReader, read_tick_archive, verify_tick_archive, write_tick_archive
+
+START_MSC = 1_700_000_000_000
+
+
+def make_ticks(rows: int, seed: int = 0) -> pd.DataFrame:
+    random = np.random.default_rng(seed)
+    time_msc = START_MSC + np.cumsum(random.integers(0, 500, rows))
+    bid = np.round(1.1 + np.cumsum(random.integers(-3, 4, rows)) * 0.00001, 5)
+    return pd.DataFrame({
+        'time': time_msc // 1000,
+        'bid': bid,
+        'ask': np.round(bid + random.integers(1, 20, rows) * 0.00001, 5),
+        'last': np.zeros(rows),
+        'volume': random.integers(0, 100, rows).astype(np.uint64),
+        'time_msc': time_msc,
+        'flags': random.choice([2, 4, 6], rows).astype(np.uint32),
+        'volume_real': np.round(random.random(rows) * 10, 2),
+    })
+
+
+def write_to_buffer(frame: pd.DataFrame, **kwargs) -> io.BytesIO:
+    buffer = io.BytesIO()
+    write_tick_archive(frame, buffer, **kwargs)
+    return buffer
+
+
+def codecs(buffer: io.BytesIO) -> dict[str, str]:
+    return {column['name']: column['codec'] for column in TickArchiveReader(buffer).columns}
+
+
+def test_round_trip_of_mt5_ticks():
+    frame = make_ticks(1001)
+    buffer = write_to_buffer(frame)
+    assert verify_tick_archive(frame, buffer)
+    assert codecs(buffer) == {'time': 'derived', 'bid': 'delta', 'ask': 'delta', 'last': 'delta',
+                              'volume': 'delta', 'time_msc': 'delta', 'flags': 'bits',
+                              'volume_real': 'delta'}
+
+
+@pytest.mark.parametrize('dtype', ['i1', 'i2', 'i4', 'i8', 'u1', 'u2', 'u4', 'u8'])
+@pytest.mark.parametrize('rows', [1, 2, 7, 1000])
+def test_round_trip_of_integer_dtypes(dtype, rows):
+    info = np.iinfo(dtype)
+    random = np.random.default_rng(rows)
+    values = random.integers(info.min, info.max, rows, dtype=dtype, endpoint=True)
+    values[0] = info.max
+    frame = pd.DataFrame({'time_msc': START_MSC + np.arange(rows), 'value': values})
+    buffer = write_to_buffer(frame)
+    assert codecs(buffer)['value'] == 'delta'
+    assert verify_tick_archive(frame, buffer)
+
+
+@pytest.mark.parametrize('dtype', ['f4', 'f8'])
+def test_round_trip_of_exact_decimals(dtype):
+    values = np.array([1.5, -2.25, 0.0, 1234.125, -0.5], dtype=dtype)
+    frame = pd.DataFrame({'time_msc': START_MSC + np.arange(len(values)), 'value': values})
+    buffer = write_to_buffer(frame)
+    assert codecs(buffer)['value'] == 'delta'
+    assert verify_tick_archive(frame, buffer)
+
+
+def test_inexact_floats_fall_back_to_raw():
+    values = np.array([np.pi, np.nan, np.inf, -np.e, 1e300])
+    frame = pd.DataFrame({'time_msc': START_MSC + np.arange(len(values)), 'value': values})
+    buffer = write_to_buffer(frame)
+    assert codecs(buffer)['value'] == 'raw'
+    assert verify_tick_archive(frame, buffer)
+
+
+def test_multiple_blocks():
+    frame = make_ticks(1000, seed=1)
+    buffer = write_to_buffer(frame, block_size=64)
+    reader = TickArchiveReader(buffer)
+    assert len(reader.index) == 16
+    assert reader.index['rows'].sum() == 1000
+    assert reader.read_block(1).equals(frame.iloc[64:128].reset_index(drop=True))
+    assert verify_tick_archive(frame, buffer)
+
+
+def test_time_range_reads_only_overlapping_blocks(monkeypatch):
+    frame = make_ticks(1000, seed=2)
+    buffer = write_to_buffer(frame, block_size=100)
+    time_from, time_to = int(frame['time_msc'][250]), int(frame['time_msc'][420])
+    reader = TickArchiveReader(buffer)
+    read_blocks = []
+    read_block = reader.read_block
+    monkeypatch.setattr(reader, 'read_block',
+                        lambda block_number: read_blocks.append(block_number) or read_block(block_number))
+
+    ticks = reader.read(time_from, time_to)
+    expected = frame[frame['time_msc'].between(time_from, time_to)].reset_index(drop=True)
+    assert ticks.equals(expected)
+    assert read_blocks == [2, 3, 4]
+
+
+def test_time_range_outside_the_file_returns_typed_empty_frame():
+    frame = make_ticks(100, seed=3)
+    ticks = read_tick_archive(write_to_buffer(frame), time_from=int(frame['time_msc'].max()) + 1)
+    assert ticks.empty
+    assert ticks.dtypes.equals(frame.dtypes)
+
+
+def test_empty_frame():
+    frame = make_ticks(0)
+    buffer = write_to_buffer(frame)
+    assert len(TickArchiveReader(buffer).index) == 0
+    assert verify_tick_archive(frame, buffer)
@@ -0,0 +1,326 @@
+"""
+Native tick archive format (.tks) with delta/columnar encoding
+
+Layout of a file:
+    MAGIC | header length (u32) | JSON header | blocks... | index | index offset (u64) | MAGIC
+
+Every block holds up to BLOCK_SIZE ticks and is decoded on its own:
+    rows (u32) | for every column: payload length (u32) | payload
+
+Column codecs:
+    delta   - integers, or prices scaled by 10 ** digits, stored as zigzag varint deltas.
+    bits    - flags, one packed bit plane per bit used in the whole file.
+    derived - 'time' column, restored as time_msc // 1000.
+    raw     - little-endian values of the column as is, fallback for inexact floats.
+
+The index holds (offset, rows, first time_msc, last time_msc) of every block,
+so blocks of a time range are read without decoding the rest of the file.
+"""
+import io
+import json
+import struct
+from pathlib import Path
+from typing import BinaryIO
+import numpy as np
+import pandas as pd
+
+MAGIC = b'TKS1'
+BLOCK_SIZE = 65536
+MAX_DIGITS = 10
+# Prices scaled to integers must stay exact in float64
+MAX_SCALED_VALUE = 2 ** 53
+INDEX_DTYPE = np.dtype([('offset', '<u8'), ('rows', '<u4'),
+                        ('time_from', '<i8'), ('time_to', '<i8')])
+
+
+def zigzag_encode(values: np.ndarray) -> np.ndarray:
+    """Maps signed int64 to uint64 so small negative numbers stay small."""
+    values = values.astype(np.int64, copy=False)
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+
+def zigzag_decode(values: np.ndarray) -> np.ndarray:
+    """Inverse of zigzag_encode."""
+    values = values.astype(np.uint64, copy=False)
+    return (values >> np.uint64(1)).view(np.int64) ^ -(values & np.uint64(1)).view(np.int64)
+
+
+def varint_encode(values: np.ndarray) -> bytes:
+    """
+    Packs uint64 values into LEB128 varints, 7 bits per byte.
+
+    :param values: array of uint64.
+    :return: packed bytes.
+    """
+    values = values.astype(np.uint64, copy=False)
+    lengths = np.ones(len(values), dtype=np.int64)
+    rest = values >> np.uint64(7)
+    while rest.any():
+        lengths += rest > 0
+        rest >>= np.uint64(7)
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    out = np.empty(int(ends[-1]) if len(ends) else 0, dtype=np.uint8)
+    rest = values.copy()
+    for byte_number in range(int(lengths.max(initial=0))):
+        mask = lengths > byte_number
+        continues = (lengths[mask] > byte_number + 1).astype(np.uint8) << 7
+        out[starts[mask] + byte_number] = (rest[mask] & np.uint64(0x7F)).astype(np.uint8) | continues
+        rest >>= np.uint64(7)
+    return out.tobytes()
+
+
+def varint_decode(data: bytes, count: int) -> np.ndarray:
+    """
+    Unpacks LEB128 varints.
+
+    :param data: packed bytes.
+    :param count: expected amount of values.
+    :return: array of uint64.
+    """
+    raw = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(raw < 0x80)
+    if len(ends) != count:
+        raise ValueError(f'Expected {count} varints, found {len(ends)}')
+    starts = np.concatenate(([0], ends[:-1] + 1)).astype(np.int64)
+    lengths = ends - starts + 1
+    values = np.zeros(count, dtype=np.uint64)
+    for byte_number in range(int(lengths.max(initial=0))):
+        mask = lengths > byte_number
+        chunk = (raw[starts[mask] + byte_number] & 0x7F).astype(np.uint64)
+        values[mask] |= chunk << np.uint64(7 * byte_number)
+    return values
+
+
+def infer_digits(values: np.ndarray) -> int | None:
+    """
+    Finds the smallest amount of decimal digits representing all values exactly.
+
+    :param values: array of floats.
+    :return: digits, None if values can't be scaled to integers exactly.
+    """
+    if not np.isfinite(values).all():
+        return None
+    for digits in range(MAX_DIGITS + 1):
+        scale = 10.0 ** digits
+        scaled = np.round(values * scale)
+        if np.abs(scaled).max(initial=0) >= MAX_SCALED_VALUE:
+            return None
+        if np.array_equal(scaled / scale, values):
+            return digits
+    return None
+
+
+def choose_codecs(frame: pd.DataFrame) -> list[dict]:
+    """
+    Picks a codec for every column of the ticks dataframe.
+
+    :param frame: ticks dataframe.
+    :return: list of column descriptions for the header.
+    """
+    columns = []
+    for name in frame.columns:
+        values = frame[name].to_numpy()
+        column = {'name': str(name), 'dtype': values.dtype.str}
+        if name == 'time' and 'time_msc' in frame.columns and \
+                np.array_equal(values, frame['time_msc'].to_numpy() // 1000):
+            column['codec'] = 'derived'
+        elif name == 'flags' and values.dtype.kind in 'iu' and (values >= 0).all():
+            used_bits = int(np.bitwise_or.reduce(values.astype(np.uint64), initial=0))
+            column.update(codec='bits', bits=[bit for bit in range(64) if used_bits >> bit & 1])
+        elif values.dtype.kind in 'iu':
+            column['codec'] = 'delta'
+        elif values.dtype.kind == 'f' and (digits := infer_digits(values)) is not None:
+            column.update(codec='delta', digits=digits)
+        elif values.dtype.kind in 'iuf':
+            column['codec'] = 'raw'
+        else:
+            raise ValueError(f'Column {name} of dtype {values.dtype} is not supported')
+        columns.append(column)
+    return columns
+
+
+def encode_column(values: np.ndarray, column: dict) -> bytes:
+    """Encodes values of one column of a block."""
+    match column['codec']:
+        case 'derived':
+            return b''
+        case 'raw':
+            return values.astype(np.dtype(column['dtype']).newbyteorder('<')).tobytes()
+        case 'bits':
+            values = values.astype(np.uint64)
+            return b''.join(
+                np.packbits(((values >> np.uint64(bit)) & np.uint64(1)).astype(np.uint8)).tobytes()
+                for bit in column['bits'])
+        case 'delta':
+            if 'digits' in column:
+                values = np.round(values * 10.0 ** column['digits'])
+            # uint64 is reinterpreted bit for bit, its deltas wrap around the same way on decoding.
+            # Narrower integers are widened, a view would regroup their bytes instead.
+            values = values.view(np.int64) if values.dtype == np.uint64 else values.astype(np.int64)
+            return varint_encode(zigzag_encode(np.diff(values, prepend=np.int64(0))))
+    raise ValueError(f'Unknown codec {column["codec"]}')
+
+
+def decode_column(payload: bytes, rows: int, column: dict, decoded: dict) -> np.ndarray:
+    """Decodes values of one column of a block."""
+    dtype = np.dtype(column['dtype'])
+    match column['codec']:
+        case 'derived':
+            return (decoded['time_msc'] // 1000).astype(dtype)
+        case 'raw':
+            return np.frombuffer(payload, dtype=dtype.newbyteorder('<')).astype(dtype)
+        case 'bits':
+            plane_size = (rows + 7) // 8
+            values = np.zeros(rows, dtype=np.uint64)
+            for plane, bit in enumerate(column['bits']):
+                packed = np.frombuffer(payload, dtype=np.uint8,
+                                       count=plane_size, offset=plane * plane_size)
+                values |= np.unpackbits(packed, count=rows).astype(np.uint64) << np.uint64(bit)
+            return values.astype(dtype)
+        case 'delta':
+            values = np.cumsum(zigzag_decode(varint_decode(payload, rows)), dtype=np.int64)
+            if 'digits' in column:
+                return (values / 10.0 ** column['digits']).astype(dtype)
+            return values.view(np.uint64).astype(dtype) if dtype == np.uint64 else values.astype(dtype)
+    raise ValueError(f'Unknown codec {column["codec"]}')
+
+
+def write_tick_archive(frame: pd.DataFrame, path_or_buf: str | Path | BinaryIO,
+                       block_size: int = BLOCK_SIZE):
+    """
+    Saves ticks dataframe to the tick archive format.
+    Writes sequentially, so path_or_buf may be a non-seekable compressed stream.
+
+    :param frame: ticks dataframe as returned by mt5.copy_ticks_* functions.
+    :param path_or_buf: output file path or writable binary stream.
+    :param block_size: maximum amount of ticks in one block.
+    """
+    if isinstance(path_or_buf, (str, Path)):
+        with open(path_or_buf, 'wb') as stream:
+            return write_tick_archive(frame, stream, block_size=block_size)
+
+    columns = choose_codecs(frame)
+    header = json.dumps({'block_size': block_size, 'rows': len(frame), 'columns': columns}).encode()
+    head = MAGIC + struct.pack('<I', len(header)) + header
+    path_or_buf.write(head)
+    offset = len(head)
+
+    arrays = {column['name']: frame[column['name']].to_numpy() for column in columns}
+    time_msc = arrays.get('time_msc')
+    index = np.zeros((len(frame) + block_size - 1) // block_size, dtype=INDEX_DTYPE)
+    for block_number, start in enumerate(range(0, len(frame), block_size)):
+        stop = min(start + block_size, len(frame))
+        block = [struct.pack('<I', stop - start)]
+        for column in columns:
+            payload = encode_column(arrays[column['name']][start:stop], column)
+            block.append(struct.pack('<I', len(payload)))
+            block.append(payload)
+        block = b''.join(block)
+        index[block_number] = (offset, stop - start,
+                               time_msc[start] if time_msc is not None else 0,
+                               time_msc[stop - 1] if time_msc is not None else 0)
+        path_or_buf.write(block)
+        offset += len(block)
+
+    path_or_buf.write(index.tobytes())
+    path_or_buf.write(struct.pack('<Q', offset) + MAGIC)
+
+
+class TickArchiveReader:
+    """
+    Reads a tick archive block by block from a seekable binary stream.
+    """
+
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+        stream.seek(0)
+        if stream.read(len(MAGIC)) != MAGIC:
+            raise ValueError('Not a tick archive')
+        header_length, = struct.unpack('<I', stream.read(4))
+        self.header = json.loads(stream.read(header_length))
+        self.columns = self.header['columns']
+
+        stream.seek(-(8 + len(MAGIC)), io.SEEK_END)
+        footer = stream.read(8 + len(MAGIC))
+        if footer[8:] != MAGIC:
+            raise ValueError('Tick archive is truncated')
+        index_offset, = struct.unpack('<Q', footer[:8])
+        index_length = stream.seek(0, io.SEEK_END) - len(footer) - index_offset
+        stream.seek(index_offset)
+        self.index = np.frombuffer(stream.read(index_length), dtype=INDEX_DTYPE)
+
+    def read_block(self, block_number: int) -> pd.DataFrame:
+        """
+        Decodes one block.
+
+        :param block_number: number of the block in the index.
+        :return: Dataframe of the block's ticks.
+        """
+        self.stream.seek(int(self.index[block_number]['offset']))
+        rows, = struct.unpack('<I', self.stream.read(4))
+        payloads = []
+        for _ in self.columns:
+            payload_length, = struct.unpack('<I', self.stream.read(4))
+            payloads.append(self.stream.read(payload_length))
+        decoded = {}
+        # Derived columns depend on the others, so they are decoded last
+        for column, payload in sorted(zip(self.columns, payloads),
+                                      key=lambda item: item[0]['codec'] == 'derived'):
+            decoded[column['name']] = decode_column(payload, rows, column, decoded)
+        return pd.DataFrame({column['name']: decoded[column['name']] for column in self.columns})
+
+    def read(self, time_from: int | None = None, time_to: int | None = None) -> pd.DataFrame:
+        """
+        Decodes ticks, only blocks overlapping the time range are read.
+
+        :param time_from: starting time_msc, inclusive.
+        :param time_to: ending time_msc, inclusive.
+        :return: Dataframe of ticks.
+        """
+        blocks = [
+            block_number for block_number, block in enumerate(self.index)
+            if (time_from is None or block['time_to'] >= time_from)
+            and (time_to is None or block['time_from'] <= time_to)
+        ]
+        if not blocks:
+            return pd.DataFrame({column['name']: np.array([], dtype=np.dtype(column['dtype']))
+                                 for column in self.columns})
+        frame = pd.concat([self.read_block(block_number) for block_number in blocks],
+                          ignore_index=True)
+        if time_from is not None:
+            frame = frame[frame['time_msc'] >= time_from]
+        if time_to is not None:
+            frame = frame[frame['time_msc'] <= time_to]
+        return frame.reset_index(drop=True)
+
+
+def read_tick_archive(path_or_buf: str | Path | BinaryIO, time_from: int | None = None,
+                      time_to: int | None = None) -> pd.DataFrame:
+    """
+    Loads ticks from the tick archive format.
+
+    :param path_or_buf: file path or seekable binary stream.
+    :param time_from: starting time_msc, inclusive.
+    :param time_to: ending time_msc, inclusive.
+    :return: Dataframe of ticks.
+    """
+    if isinstance(path_or_buf, (str, Path)):
+        with open(path_or_buf, 'rb') as stream:
+            return TickArchiveReader(stream).read(time_from, time_to)
+    return TickArchiveReader(path_or_buf).read(time_from, time_to)
+
+
+def verify_tick_archive(frame: pd.DataFrame, path_or_buf: str | Path | BinaryIO | None = None) -> bool:
+    """
+    Checks ticks survive a round trip through the tick archive format unchanged.
+
+    :param frame: original ticks dataframe.
+    :param path_or_buf: saved archive to check, the frame is encoded in memory if None.
+    :return: True if decoded ticks are equal to the original.
+    """
+    if path_or_buf is None:
+        path_or_buf = io.BytesIO()
+        write_tick_archive(frame, path_or_buf)
+    decoded = read_tick_archive(path_or_buf)
+    return decoded.equals(frame.reset_index(drop=True))
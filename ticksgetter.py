@@ -1,13 +1,69 @@
+import logging
 from pathlib import Path
 from functools import singledispatchmethod
 from string import Template
-from datetime import datetime
+from typing import Callable
+from datetime import datetime, timedelta
 import MetaTrader5 as mt5
 import pandas as pd
 import pytz
-from main import logger
 from datatypes import Ticks, Formats
+from compression import Compression, Archive, ArchiveWriter, open_compressed, write_ticks
 from accounts import LoginInfo, Accounts
+from planner import FetchPlan, plan_fetch
+
+logger = logging.getLogger(__name__)
+
+
+def ensure_utc(date: datetime) -> datetime:
+    """
+    Makes a date timezone-aware, naive dates are treated as UTC.
+    MetaTrader5 converts naive dates using the local timezone of the machine.
+    """
+    return date if date.tzinfo else pytz.utc.localize(date)
+
+
+def split_range(utc_from: datetime, utc_to: datetime,
+                chunk_duration: timedelta) -> list[tuple[datetime, datetime]]:
+    """
+    Splits range of dates into consecutive windows.
+
+    :param utc_from: starting date of the range.
+    :param utc_to: ending date of the range.
+    :param chunk_duration: duration of one window, the last one may be shorter.
+    :return: list of (window_from, window_to) tuples.
+    """
+    windows = []
+    window_from = utc_from
+    while window_from < utc_to:
+        window_to = min(window_from + chunk_duration, utc_to)
+        windows.append((window_from, window_to))
+        window_from = window_to
+    return windows
+
+
+def copy_ticks_window(symbol: str, window_from: datetime, window_to: datetime,
+                      is_last: bool = True):
+    """
+    Gets ticks of one window of a range.
+
+    :param symbol: symbol to get ticks of.
+    :param window_from: starting date of the window.
+    :param window_to: ending date of the window.
+    :param is_last: False if the next window starts at window_to.
+    :return: numpy array of ticks, None if the terminal failed.
+    """
+    window_from, window_to = ensure_utc(window_from), ensure_utc(window_to)
+    ticks = mt5.copy_ticks_range(symbol, window_from, window_to, mt5.COPY_TICKS_ALL)
+    if ticks is None:
+        logger.error('Chunk %s - %s of %s failed, MT Last error - %s',
+                     window_from, window_to, symbol, mt5.last_error())
+        return None
+    if not is_last:
+        # Range ends are inclusive, the boundary tick belongs to the next window
+        window_to_msc = int(window_to.timestamp() * 1000)
+        ticks = ticks[ticks['time_msc'] < window_to_msc]
+    return ticks
 
 
 class TicksGetter:
@@ -26,9 +82,14 @@ class TicksGetter:
         self.not_found_ticks: list[str] = []
         self.symbols_from_server = set()
         self.collected_tickets: list[Ticks] = []
+        self.ram_budget = 1024 ** 3
+        self.fetch_plan: FetchPlan | None = None
         self.template = Template(
                 'ticks_${format}/${filename}_${broker}_${date_from}_${date_to}.$format_extension'
         )
+        self.archive_template = Template(
+                'ticks_${format}/${broker}_${created}.$archive_extension'
+        )
 
     def get_account_from_string(self, account_name: str) -> LoginInfo | bool:
         """
@@ -92,41 +153,139 @@ class TicksGetter:
         logger.info('Got account information the server')
         return True
 
-    def save_ticks_to_file(self, format_: Formats) -> bool:
+    def save_ticks_to_file(self, format_: Formats,
+                           compression: Compression = Compression.NONE,
+                           archive: Archive = Archive.NONE,
+                           level: int | None = None) -> bool:
         """
         Saves ticks to a file in one of the format from Formats class.
+        Files are compressed while being written, optionally all of them are bundled into one archive.
 
         :param format_: format to save to
+        :param compression: codec to compress every saved file with, ignored if archive is set.
+        :param archive: archive to bundle all collected ticks into.
+        :param level: compression level of the codec or archive, codec default if None.
         :return: False if saved file not found in the directory of corresponding format.
         """
         format_name = format_.value
         Path(f'ticks_{format_name}').mkdir(parents=True, exist_ok=True)
+        if archive is not Archive.NONE:
+            return self.save_ticks_to_archive(format_, archive, level)
         for ticks_file in self.collected_tickets:
-            out_filename_template = self.template.substitute(
-                format=format_name,
-                filename=ticks_file.TITLE,
-                broker=ticks_file.BROKER,
-                date_from=f'{ticks_file.DATE_FROM.year}_'
-                          f'{ticks_file.DATE_FROM.month}_'
-                          f'{ticks_file.DATE_FROM.day}',
-                date_to=f'{ticks_file.DATE_TO.year}_'
-                        f'{ticks_file.DATE_TO.month}_'
-                        f'{ticks_file.DATE_TO.day}',
-                format_extension=format_name)
-            path = Path(out_filename_template).resolve()
-
-            # Call a saving function corresponding to the given format
-            logger.info('Saving %s to .%s...', ticks_file.TITLE, format_name)
-            Formats.save_match_format(ticks_file, format_)(path)
-            try:
-                if Path.is_file(path):  # Checking file actually saved and presents in the folder
-                    logger.info('Successfully saved to %s\n', path.name)
-            except FileNotFoundError:
-                logger.error('ERROR while saving to .%s', format_name)
+            if not self.save_ticks_file(ticks_file, format_, compression, level):
                 return False
         self.collected_tickets.clear()
         return True
 
+    def save_ticks_file(self, ticks_file: Ticks, format_: Formats,
+                        compression: Compression = Compression.NONE,
+                        level: int | None = None) -> bool:
+        """
+        Saves one Ticks to a file, compressed while being written.
+
+        :param ticks_file: ticks to save.
+        :param format_: format to save to.
+        :param compression: codec to compress the file with.
+        :param level: compression level of the codec, codec default if None.
+        :return: False if saved file not found in the directory of corresponding format.
+        """
+        out_filename_template = self.get_ticks_filename(ticks_file, format_)
+        if compression is not Compression.NONE:
+            out_filename_template += f'.{compression.value}'
+        path = Path(out_filename_template).resolve()
+
+        # Call a saving function corresponding to the given format
+        logger.info('Saving %s to %s...', ticks_file.TITLE, path.name)
+        with open_compressed(path, compression, level=level) as stream:
+            write_ticks(ticks_file, format_, stream)
+        try:
+            if Path.is_file(path):  # Checking file actually saved and presents in the folder
+                logger.info('Successfully saved to %s\n', path.name)
+        except FileNotFoundError:
+            logger.error('ERROR while saving to .%s', format_.value)
+            return False
+        return True
+
+    def save_ticks_to_archive(self, format_: Formats, archive: Archive,
+                              level: int | None = None) -> bool:
+        """
+        Saves all collected ticks into a single archive.
+
+        :param format_: format of the files inside the archive.
+        :param archive: archive type from Archive class.
+        :param level: compression level of the archive, default if None.
+        :return: False if the archive was not saved.
+        """
+        if not self.collected_tickets:
+            logger.warning('No ticks to archive')
+            return False
+        path = self.get_archive_path(format_, archive, self.collected_tickets[0].BROKER)
+        logger.info('Saving %i files to %s...', len(self.collected_tickets), path.name)
+        with ArchiveWriter(path, archive, level=level) as archive_writer:
+            for ticks_file in self.collected_tickets:
+                self.add_ticks_to_archive(archive_writer, ticks_file, format_)
+        if not Path.is_file(path):
+            logger.error('ERROR while saving to %s', path.name)
+            return False
+        logger.info('Successfully saved to %s\n', path.name)
+        self.collected_tickets.clear()
+        return True
+
+    def add_ticks_to_archive(self, archive_writer: ArchiveWriter, ticks_file: Ticks, format_: Formats):
+        """
+        Writes one Ticks as a member of an opened archive.
+
+        :param archive_writer: opened archive.
+        :param ticks_file: ticks to write.
+        :param format_: format of the member.
+        """
+        member_name = Path(self.get_ticks_filename(ticks_file, format_)).name
+        logger.info('Adding %s to %s', member_name, archive_writer.path.name)
+        archive_writer.add(member_name, ticks_file, format_)
+
+    def get_archive_path(self, format_: Formats, archive: Archive, broker: str) -> Path:
+        """
+        Builds path of an archive of one run from the template.
+
+        :param format_: format of the files inside the archive.
+        :param archive: archive type from Archive class.
+        :param broker: name of broker.
+        :return: absolute path of the archive.
+        """
+        return Path(self.archive_template.substitute(
+            format=format_.value,
+            broker=broker,
+            created=datetime.now().strftime('%Y_%m_%d_%H%M%S'),
+            archive_extension=archive.value)).resolve()
+
+    def get_ticks_filename(self, ticks_file: Ticks, format_: Formats) -> str:
+        """
+        Builds output filename of ticks from the template.
+
+        :param ticks_file: ticks to name the file for.
+        :param format_: format of the file.
+        :return: relative path of the file.
+        """
+        format_name = format_.value
+        return self.template.substitute(
+            format=format_name,
+            filename=ticks_file.TITLE,
+            broker=ticks_file.BROKER,
+            date_from=self.format_date(ticks_file.DATE_FROM),
+            date_to=self.format_date(ticks_file.DATE_TO),
+            format_extension=format_name)
+
+    @staticmethod
+    def format_date(date: datetime) -> str:
+        """
+        Formats a date for filenames, hours and minutes are added if they are set,
+        so files of parts of one day don't overwrite each other.
+        """
+        formatted = f'{date.year}_{date.month}_{date.day}'
+        if date.hour or date.minute:
+            formatted += f'_{date.hour:02}{date.minute:02}'
+        return formatted
+
     def close_connection(self):
         """
         Closes the connection to MT account, shutdowns terminal.
@@ -141,11 +300,13 @@ class TicksGetter:
         else:
             logger.warning('Connection was not established')
 
-    def get_ticks(self, symbols: tuple | str) -> bool:
+    def get_ticks(self, symbols: tuple | str,
+                  on_ticks: Callable[[Ticks], None] | None = None) -> bool:
         """
         Function to get ticks of symbols.
 
         :param symbols: Tuple of symbols
+        :param on_ticks: called with every collected Ticks instead of keeping it in collected_tickets.
         """
         if not self.authorized:
             logger.error('Can\' get ticks - not logged in')
@@ -155,36 +316,139 @@ class TicksGetter:
             logger.info('Done parsing ticks')
             if self.not_found_ticks:
                 logger.info('Ticks not found for symbols: %s', self.not_found_ticks)
+            self.fetch_plan = None
             return True
 
+        self.utc_from, self.utc_to = ensure_utc(self.utc_from), ensure_utc(self.utc_to)
         logger.info('Symbols in the queue - %s', symbols)
         current_symbol = symbols[0]
 
         logger.info('Parsing ticks of %s from date %s to %s',
                     current_symbol, self.utc_from, self.utc_to)
-        ticks = mt5.copy_ticks_range(current_symbol, self.utc_from, self.utc_to, mt5.COPY_TICKS_ALL)
-        if self.match_status_code() == 1:
-            if len(ticks):
-                logger.info('Ticks received: %i\n', len(ticks))
-                ticks_frame = pd.DataFrame(ticks)
-                ticks = Ticks(
-                    TITLE=current_symbol,
-                    DATAFRAME=ticks_frame,
-                    DATE_FROM=self.utc_from,
-                    DATE_TO=self.utc_to,
-                    BROKER=''.join(self.company_name.split())
-                  )
-                self.collected_tickets.append(ticks)
-            else:
-                logger.warning('Symbol found but no ticks received')
-                self.not_found_ticks.append(current_symbol)
+        estimate = self.fetch_plan.ESTIMATES.get(current_symbol) if self.fetch_plan else None
+        if estimate and estimate.CHUNKS > 1:
+            received = self.get_ticks_partly(current_symbol, estimate.CHUNK_DURATION,
+                                             self.fetch_plan.PART_BYTES, on_ticks)
         else:
+            ticks = mt5.copy_ticks_range(current_symbol, self.utc_from, self.utc_to, mt5.COPY_TICKS_ALL)
+            received = len(ticks) if self.match_status_code() == 1 else None
+            if received:
+                self.collect_ticks(current_symbol, pd.DataFrame(ticks),
+                                   self.utc_from, self.utc_to, on_ticks)
+        if received is None:
             logger.error('Can\'t get ticks from %s;\n', current_symbol)
+        elif received:
+            logger.info('Ticks received: %i\n', received)
+        else:
+            logger.warning('Symbol found but no ticks received')
+            self.not_found_ticks.append(current_symbol)
+
+        return self.get_ticks(symbols=symbols[1::], on_ticks=on_ticks)
+
+    def collect_ticks(self, symbol: str, ticks_frame: pd.DataFrame, date_from: datetime,
+                      date_to: datetime, on_ticks: Callable[[Ticks], None] | None = None):
+        """
+        Wraps received ticks into Ticks and passes it to on_ticks or to collected_tickets.
+        """
+        ticks = Ticks(
+            TITLE=symbol,
+            DATAFRAME=ticks_frame,
+            DATE_FROM=date_from,
+            DATE_TO=date_to,
+            BROKER=''.join(self.company_name.split())
+          )
+        if on_ticks:
+            on_ticks(ticks)
+        else:
+            self.collected_tickets.append(ticks)
+
+    def get_ticks_to_file(self, symbols: tuple, format_: Formats,
+                          compression: Compression = Compression.NONE,
+                          archive: Archive = Archive.NONE,
+                          level: int | None = None) -> bool:
+        """
+        Gets ticks of symbols and saves every part as soon as it's received,
+        so no more than one part of the planned size is held in memory.
 
-        self.get_ticks(symbols=symbols[1::])
+        :param symbols: Tuple of symbols
+        :param format_: format to save to
+        :param compression: codec to compress every saved file with, ignored if archive is set.
+        :param archive: archive to bundle all saved files into.
+        :param level: compression level of the codec or archive, codec default if None.
+        :return: False if not logged in.
+        """
+        if not self.authorized:
+            logger.error('Can\' get ticks - not logged in')
+            return False
+        Path(f'ticks_{format_.value}').mkdir(parents=True, exist_ok=True)
+        if archive is Archive.NONE:
+            return self.get_ticks(symbols, on_ticks=lambda ticks_file: self.save_ticks_file(
+                ticks_file, format_, compression, level))
+
+        path = self.get_archive_path(format_, archive, ''.join(self.company_name.split()))
+        with ArchiveWriter(path, archive, level=level) as archive_writer:
+            done = self.get_ticks(symbols, on_ticks=lambda ticks_file: self.add_ticks_to_archive(
+                archive_writer, ticks_file, format_))
+        logger.info('Saved to %s\n', path.name)
+        return done
 
-    def get_ticks_partly(self, symbol: tuple | str):
-        ...
+    def plan_ticks(self, symbols: tuple) -> FetchPlan | bool:
+        """
+        Estimates volume of symbols' ticks and plans chunks fitting the RAM budget.
+        The plan is used by the next get_ticks call.
+
+        :param symbols: Tuple of symbols
+        :return: FetchPlan, False if not logged in or dates are invalid.
+        """
+        if not self.authorized:
+            logger.error('Can\' plan ticks - not logged in')
+            return False
+        self.utc_from, self.utc_to = ensure_utc(self.utc_from), ensure_utc(self.utc_to)
+        if self.utc_from >= self.utc_to:
+            logger.error('Can\' plan ticks - "Date to" must be greater than "Date from"')
+            return False
+        self.fetch_plan = plan_fetch(symbols, self.utc_from, self.utc_to, ram_budget=self.ram_budget)
+        return self.fetch_plan
+
+    def get_ticks_partly(self, symbol: str, chunk_duration: timedelta, part_bytes: int,
+                         on_ticks: Callable[[Ticks], None] | None = None) -> int | None:
+        """
+        Gets ticks of a symbol in chunks of chunk_duration.
+        Chunks are joined into parts up to part_bytes, every part is collected as soon as it's full.
+
+        :param symbol: symbol to get ticks of.
+        :param chunk_duration: duration of one requested chunk.
+        :param part_bytes: maximum size of ticks in one part.
+        :param on_ticks: called with every part, see get_ticks.
+        :return: amount of received ticks, None if any chunk failed.
+        """
+        windows = split_range(self.utc_from, self.utc_to, chunk_duration)
+        logger.info('Parsing %s in %i chunks of %s', symbol, len(windows), chunk_duration)
+        received = 0
+        part: list[pd.DataFrame] = []
+        part_size = 0
+        part_from = self.utc_from
+        chunk_size = 0
+        for window_from, window_to in windows:
+            # Collected before the next chunk is fetched, assuming it's as big as the previous one,
+            # so the part isn't concatenated while a fetched chunk is held too
+            if part and part_size + chunk_size > part_bytes:
+                self.collect_ticks(symbol, pd.concat(part, ignore_index=True),
+                                   part_from, window_from, on_ticks)
+                part, part_size, part_from = [], 0, window_from
+            ticks = copy_ticks_window(symbol, window_from, window_to, is_last=window_to >= self.utc_to)
+            if ticks is None:
+                return None
+            chunk_size = ticks.nbytes
+            if len(ticks):
+                part.append(pd.DataFrame(ticks))
+                part_size += chunk_size
+                received += len(ticks)
+            del ticks
+        if part:
+            self.collect_ticks(symbol, pd.concat(part, ignore_index=True),
+                               part_from, self.utc_to, on_ticks)
+        return received
 
     def match_status_code(self) -> int:
         status_code = mt5.last_error()[0]